@@ -6,27 +6,115 @@ import os
 import argparse
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Headless backend; plots are only ever saved to disk
 import matplotlib.pyplot as plt
+import tensorflow as tf
 from tensorflow.keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler
 
 from src import config
-from src.data_loader import load_data
+from src.data_loader import load_data, load_tail, FastMinMax
+from src.model import make_forecast_fn, make_tflite_predict_fn
+
+# Model files in order of preference; 'model.h5' is kept for older model folders
+MODEL_FILENAMES = ('model.keras', 'model.h5')
+
+def find_model_file(model_folder):
+    """Finds the Keras model file in a model folder, preferring the .keras format."""
+    for filename in MODEL_FILENAMES:
+        model_path = os.path.join(model_folder, filename)
+        try:
+            os.stat(model_path)
+        except FileNotFoundError:
+            continue
+        return model_path
+    return None
 
 def find_latest_model_path(model_dir):
-    """Finds the path to the model.h5 file in the latest model folder."""
+    """Finds the path to the model file in the latest model folder."""
     if not os.path.exists(model_dir):
         return None
-        
-    subfolders = [os.path.join(model_dir, d) for d in os.listdir(model_dir) if os.path.isdir(os.path.join(model_dir, d))]
+
+    # DirEntry caches the file type from readdir, saving a syscall per subfolder
+    with os.scandir(model_dir) as entries:
+        subfolders = [(entry.path, entry.stat().st_ctime) for entry in entries if entry.is_dir()]
     
     if not subfolders:
         return None
         
-    latest_folder = max(subfolders, key=os.path.getctime)
-    model_path = os.path.join(latest_folder, 'model.h5')
-    
-    return model_path if os.path.exists(model_path) else None
+    latest_folder = max(subfolders, key=lambda folder: folder[1])[0]
+    return find_model_file(latest_folder)
+
+def build_forecast_fn(model, window_size, horizon, jit_compile=False):
+    """
+    Wraps a Keras model in a rolling forecast function, XLA-compiled if `jit_compile` is set.
+
+    Returns:
+        A function mapping a (batch, window_size, 1) tensor to (batch, horizon).
+    """
+    forecast = make_forecast_fn(model, window_size, horizon, jit_compile=jit_compile)
+    # Warm up once so tracing (and any XLA compilation) is paid before the real call
+    forecast(tf.zeros((1, window_size, 1), dtype=tf.float32))
+    return forecast
+
+def build_savedmodel_forecast_fn(savedmodel_path, window_size, horizon):
+    """
+    Loads the forecast signature exported with the model as a SavedModel.
+
+    The signature is already traced for a batch size of 1, so loading it skips
+    rebuilding the Keras model and retracing the forecast loop.
+
+    Returns:
+        A function mapping a (1, window_size, 1) tensor to (1, horizon), or None if
+        the exported forecast horizon does not match `horizon`.
+    """
+    loaded = tf.saved_model.load(savedmodel_path)
+    signature = loaded.signatures['forecast']
+    if signature.structured_outputs['output_0'].shape[-1] != horizon:
+        return None
+
+    def forecast(x):
+        return signature(x=x)['output_0']
+
+    # Warm up once so the XLA compilation cost is paid before the real call
+    forecast(tf.zeros((1, window_size, 1), dtype=tf.float32))
+    # Keep a reference to the loaded object so its variables stay alive
+    forecast.loaded = loaded
+    return forecast
+
+def build_tflite_forecast_fn(tflite_path, window_size, horizon):
+    """
+    Loads an INT8 TFLite model and returns a rolling forecast function.
+
+    Returns:
+        A function mapping a (1, window_size, 1) array to a (1, horizon) array.
+    """
+    predict_next = make_tflite_predict_fn(tflite_path, num_threads=os.cpu_count())
+
+    def forecast(x):
+        window = np.asarray(x, dtype=np.float32)[0, :, 0].copy()
+        predictions = np.empty(horizon, dtype=np.float32)
+        for step in range(horizon):
+            predictions[step] = predict_next(window[:, None])
+            window = np.append(window[1:], predictions[step])
+        return predictions[None, :]
+
+    return forecast
+
+def get_forecast_dates(known_dates, start_date, n_days):
+    """
+    Returns the `n_days` trading dates starting at `start_date`.
+
+    Dates present in the sorted `known_dates` array (datetime64[D]) are used first;
+    any remaining dates beyond the end of it are filled in with business days.
+    """
+    start_idx = np.searchsorted(known_dates, np.datetime64(start_date, 'D'))
+    dates = pd.DatetimeIndex(known_dates[start_idx:start_idx + n_days])
+    remaining = n_days - len(dates)
+    if remaining > 0:
+        extra_start = dates[-1] + pd.offsets.BDay(1) if len(dates) else start_date
+        dates = dates.append(pd.bdate_range(start=extra_start, periods=remaining))
+    return dates
 
 def plot_predictions(true_data, predicted_data, model_folder):
     """Saves a plot of the true vs. predicted stock prices."""
@@ -50,33 +138,63 @@ def predict(model_folder_path=None):
     # --- 1. Load Model ---
     if model_folder_path is None:
         print("No model folder provided, searching for the latest model...")
-        model_h5_path = find_latest_model_path(config.MODEL_DIR)
-        if model_h5_path is None:
-            raise FileNotFoundError(f"No 'model.h5' found in any subfolder of '{config.MODEL_DIR}'. Please train a model first.")
-        model_folder_path = os.path.dirname(model_h5_path)
+        model_file_path = find_latest_model_path(config.MODEL_DIR)
+        if model_file_path is None:
+            raise FileNotFoundError(f"No 'model.keras' or 'model.h5' found in any subfolder of '{config.MODEL_DIR}'. Please train a model first.")
+        model_folder_path = os.path.dirname(model_file_path)
+    else:
+        model_file_path = find_model_file(model_folder_path)
+
+    if config.USE_TFLITE_INT8:
+        tflite_path = os.path.join(model_folder_path, 'model_int8.tflite')
+        print(f"Loading INT8 TFLite model from: {tflite_path}")
+        if not os.path.exists(tflite_path):
+            raise FileNotFoundError(f"TFLite model file not found at {tflite_path}")
+        forecast = build_tflite_forecast_fn(tflite_path, config.WINDOW_SIZE, config.PREDICTION_DAYS)
     else:
-        model_h5_path = os.path.join(model_folder_path, 'model.h5')
+        forecast = None
+        savedmodel_path = os.path.join(model_folder_path, 'savedmodel')
+        if os.path.isdir(savedmodel_path):
+            print(f"Loading SavedModel from: {savedmodel_path}")
+            forecast = build_savedmodel_forecast_fn(savedmodel_path, config.WINDOW_SIZE, config.PREDICTION_DAYS)
+            if forecast is None:
+                print("SavedModel was exported for a different PREDICTION_DAYS, falling back to the Keras model...")
 
-    print(f"Loading model from: {model_h5_path}")
-    if not os.path.exists(model_h5_path):
-        raise FileNotFoundError(f"Model file not found at {model_h5_path}")
-    model = load_model(model_h5_path)
+        if forecast is None:
+            if model_file_path is None:
+                raise FileNotFoundError(f"No 'model.keras' or 'model.h5' found in {model_folder_path}")
+            print(f"Loading model from: {model_file_path}")
+            model = load_model(model_file_path)
+            forecast = build_forecast_fn(model, config.WINDOW_SIZE, config.PREDICTION_DAYS,
+                                         jit_compile=config.TRAINING_PARAMS.get('jit_compile', False))
 
     # --- 2. Load Data ---
     print("Loading data for prediction...")
-    df = load_data(config.DATA_DIR, config.TICKER, config.TARGET_COL)
-
     # We need the last `window_size` days from the training/validation data to start predicting
     prediction_start_date = pd.to_datetime(config.PREDICTION_START_DATE)
     required_start_date = prediction_start_date - pd.DateOffset(days=config.WINDOW_SIZE * 2) # Fetch more to be safe
+
+    # Predictions usually start near the end of the data, so try reading just the tail of the file
+    df = load_tail(config.DATA_DIR, config.TICKER, config.TARGET_COL,
+                   n_rows=config.WINDOW_SIZE * 2 + config.PREDICTION_DAYS)
+    if df.empty or df.index[0] > required_start_date:
+        df = load_data(config.DATA_DIR, config.TICKER, config.TARGET_COL,
+                       start_date=required_start_date, chunksize=100_000)
     
     inputs_df = df.loc[required_start_date:prediction_start_date].copy()
     
     # --- 3. Preprocess Data ---
-    scaler = MinMaxScaler(feature_range=(0,1))
-    # Note: We fit the scaler on the same data range the model was trained on for consistency
-    training_data_for_scaling = df.loc[:config.TRAIN_END_DATE]
-    scaler.fit(training_data_for_scaling[[config.TARGET_COL]])
+    scaler_path = os.path.join(model_folder_path, 'scaler.npz')
+    if os.path.exists(scaler_path):
+        scaler = FastMinMax.load(scaler_path)
+    else:
+        # Older model folders have no saved scaler, so refit it on the training range
+        print(f"No scaler found at {scaler_path}, refitting on the training data...")
+        scaler = FastMinMax()
+        # Note: We fit the scaler on the same data range the model was trained on for consistency
+        full_df = load_data(config.DATA_DIR, config.TICKER, config.TARGET_COL)
+        training_data_for_scaling = full_df.loc[:config.TRAIN_END_DATE]
+        scaler.fit(training_data_for_scaling[[config.TARGET_COL]])
     
     scaled_inputs = scaler.transform(inputs_df[[config.TARGET_COL]])
 
@@ -87,18 +205,24 @@ def predict(model_folder_path=None):
     X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
 
     # --- 4. Make Predictions ---
-    print("Making predictions...")
-    predicted_price_scaled = model.predict(X_test)
-    predicted_price = scaler.inverse_transform(predicted_price_scaled)
+    print(f"Making predictions for the next {config.PREDICTION_DAYS} days...")
+    predicted_price_scaled = np.asarray(forecast(tf.constant(X_test, dtype=tf.float32)))
+    predicted_price = scaler.inverse_transform(predicted_price_scaled.reshape(-1, 1))
 
     # --- 5. Display and Plot Results ---
-    prediction_date = df.index[df.index.searchsorted(prediction_start_date)]
-    print(f"Predicted price for {prediction_date.date()}: {predicted_price[0][0]:.2f}")
+    dates_path = os.path.join(model_folder_path, 'dates.npy')
+    if os.path.exists(dates_path):
+        known_dates = np.load(dates_path)
+    else:
+        known_dates = df.index.values.astype('datetime64[D]')
+    prediction_dates = get_forecast_dates(known_dates, config.PREDICTION_START_DATE, config.PREDICTION_DAYS)
+    for prediction_date, price in zip(prediction_dates, predicted_price[:, 0]):
+        print(f"Predicted price for {prediction_date.date()}: {price:.2f}")
 
     # For plotting, let's get a range of actual data to compare against
-    actual_data_to_plot = df.loc[prediction_start_date - pd.DateOffset(months=2):prediction_start_date]
+    actual_data_to_plot = df.loc[prediction_start_date - pd.DateOffset(months=2):prediction_dates[-1]]
     predicted_df = pd.DataFrame(predicted_price, 
-                                index=[prediction_date], 
+                                index=prediction_dates, 
                                 columns=['Predicted'])
 
     plot_predictions(actual_data_to_plot[config.TARGET_COL], predicted_df['Predicted'], model_folder_path)
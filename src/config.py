@@ -33,7 +33,11 @@ MODEL_ARCHITECTURE = {
         {'type': 'dropout', 'rate': 0.2},
         {'type': 'dense', 'units': 32, 'activation': 'relu'},
         {'type': 'dense', 'units': 1} # Output layer
-    ]
+    ],
+    # Fold a Dropout placed right before an LSTM into that LSTM's input dropout.
+    # This changes the regularization (one mask shared across timesteps instead of
+    # a fresh one per timestep); set to False to keep standalone Dropout layers.
+    'fuse_dropout_into_lstm': True
 }
 
 # --- Training Parameters ---
@@ -41,14 +45,24 @@ TRAINING_PARAMS = {
     'epochs': 50,
     'batch_size': 32,
     'learning_rate': 0.001,
-    'loss_function': 'mse' # Mean Squared Error
+    'loss_function': 'mse', # Mean Squared Error
+    'jit_compile': True, # Compile with XLA; set to False if a layer is unsupported
+    'precision': 'float32' # 'float32', 'mixed_float16' (GPU) or 'mixed_bfloat16' (TPU / recent CPUs)
 }
 
+# --- Export Parameters ---
+# Also export a post-training INT8-quantized TFLite model for CPU inference.
+# Only supported when TRAINING_PARAMS['precision'] is 'float32'.
+EXPORT_TFLITE_INT8 = True
+
 # --- Prediction Parameters ---
 # How many future days to predict
 PREDICTION_DAYS = 30
 # Date from which to start the prediction
 PREDICTION_START_DATE = '2023-01-01'
+# Run predictions with the INT8 TFLite model instead of the Keras model.
+# Check the INT8 validation error printed at the end of training before enabling this.
+USE_TFLITE_INT8 = False
 
 # --- Utility ---
 def get_model_save_path():
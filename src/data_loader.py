@@ -2,19 +2,83 @@
 """
 Module for loading and preprocessing stock data.
 """
+import io
 import os
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+import tensorflow as tf
 
-def load_data(data_dir, ticker, target_col):
+class FastMinMax:
+    """
+    Min-max scaler to the (0, 1) range for single-column data.
+
+    A lightweight replacement for sklearn's MinMaxScaler that applies the affine
+    transform directly with numpy in float32, without the generic per-column
+    validation and bookkeeping.
+    """
+    def __init__(self):
+        self.min_ = None
+        self.scale_ = None
+
+    def fit(self, x):
+        """Computes the minimum and scale from the data."""
+        x = np.asarray(x, dtype=np.float32)
+        data_min, data_max = x.min(), x.max()
+        data_range = data_max - data_min
+        self.min_ = np.float32(data_min)
+        self.scale_ = np.float32(1.0 / data_range if data_range != 0 else 1.0)
+        return self
+
+    def transform(self, x):
+        """Scales the data to the (0, 1) range."""
+        return (np.asarray(x, dtype=np.float32) - self.min_) * self.scale_
+
+    def fit_transform(self, x):
+        """Fits the scaler and scales the data."""
+        return self.fit(x).transform(x)
+
+    def inverse_transform(self, x):
+        """Maps scaled data back to its original range."""
+        return np.asarray(x, dtype=np.float32) / self.scale_ + self.min_
+
+    def save(self, path):
+        """Saves the fitted parameters to an .npz file."""
+        np.savez(path, min_=self.min_, scale_=self.scale_)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a scaler saved with .save()."""
+        scaler = cls()
+        with np.load(path) as params:
+            scaler.min_ = params['min_'][()]
+            scaler.scale_ = params['scale_'][()]
+        return scaler
+
+def _read_csv_kwargs(target_col):
+    """Returns the pandas.read_csv arguments shared by the CSV loaders."""
+    return dict(
+        usecols=['Date', target_col],
+        parse_dates=['Date'],
+        index_col='Date',
+        dtype={target_col: np.float32},
+        engine='c'
+    )
+
+def load_data(data_dir, ticker, target_col, start_date=None, chunksize=None):
     """
     Loads stock data from a CSV file.
+
+    Only the 'Date' and target columns are parsed, with the target read directly
+    as float32.
     
     Args:
         data_dir (str): The directory where the data is stored.
         ticker (str): The filename of the stock data CSV.
         target_col (str): The name of the column to be used as the target variable.
+        start_date (str, optional): If given, rows before this date are dropped.
+        chunksize (int, optional): If given, the file is read in chunks of this many
+            rows and filtered by `start_date` as it is read, keeping peak memory low
+            for very large files.
 
     Returns:
         pd.DataFrame: A DataFrame with 'Date' as the index and the target column.
@@ -22,41 +86,125 @@ def load_data(data_dir, ticker, target_col):
     csv_path = os.path.join(data_dir, ticker)
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"Data file not found at: {csv_path}")
-        
-    df = pd.read_csv(csv_path)
-    df = df[['Date', target_col]]
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.set_index('Date', inplace=True)
-    return df
 
-def preprocess_data(df, window_size):
+    read_kwargs = _read_csv_kwargs(target_col)
+    start = pd.to_datetime(start_date) if start_date is not None else None
+
+    if chunksize is None:
+        df = pd.read_csv(csv_path, **read_kwargs)
+        return df.loc[start:] if start is not None else df
+
+    chunks = []
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, **read_kwargs):
+        if start is not None:
+            chunk = chunk.loc[chunk.index >= start]
+        chunks.append(chunk)
+    return pd.concat(chunks)
+
+def load_tail(data_dir, ticker, target_col, n_rows, chunk_size=64 * 1024):
+    """
+    Loads only the last `n_rows` rows of a stock data CSV file.
+
+    The file is read backwards from its end in chunks until enough lines have
+    been collected, so the cost depends on `n_rows` rather than the file size.
+
+    Args:
+        data_dir (str): The directory where the data is stored.
+        ticker (str): The filename of the stock data CSV.
+        target_col (str): The name of the column to be used as the target variable.
+        n_rows (int): The number of rows to load from the end of the file.
+        chunk_size (int): The number of bytes to read per step.
+
+    Returns:
+        pd.DataFrame: A DataFrame with 'Date' as the index and the target column.
+    """
+    csv_path = os.path.join(data_dir, ticker)
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Data file not found at: {csv_path}")
+
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        pos = f.seek(0, os.SEEK_END)
+        tail = b''
+        # One extra newline guarantees the first of the `n_rows` lines is complete
+        while pos > data_start and tail.count(b'\n') <= n_rows:
+            read_size = min(chunk_size, pos - data_start)
+            pos -= read_size
+            f.seek(pos)
+            tail = f.read(read_size) + tail
+
+    if pos > data_start:
+        # Drop the partial line at the start of the chunk
+        tail = tail[tail.index(b'\n') + 1:]
+
+    df = pd.read_csv(io.BytesIO(header + tail), **_read_csv_kwargs(target_col))
+    return df.iloc[-n_rows:]
+
+def to_series(data):
+    """
+    Returns the first column of the data as a single contiguous float32 buffer.
+
+    Args:
+        data (pd.DataFrame or np.array): The data with shape (n_samples, n_features).
+
+    Returns:
+        np.array: A 1-D float32 array of length n_samples.
+    """
+    return np.ascontiguousarray(np.asarray(data, dtype=np.float32)[:, 0])
+
+def window_view(series, window_size):
     """
-    Preprocesses the data by scaling and creating windowed datasets.
+    Returns the input windows of a 1-D series as a zero-copy strided view.
 
     Args:
-        df (pd.DataFrame): The input data.
+        series (np.array): The 1-D series.
         window_size (int): The size of the sliding window.
 
     Returns:
-        tuple: A tuple containing:
-            - np.array: The windowed input data (X).
-            - np.array: The target data (y).
-            - MinMaxScaler: The scaler used for the data.
+        np.array: A read-only view with shape [samples, time steps, 1].
     """
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(df)
+    return np.lib.stride_tricks.sliding_window_view(series[:-1], window_size)[..., None]
 
-    X, y = [], []
-    for i in range(window_size, len(scaled_data)):
-        X.append(scaled_data[i-window_size:i, 0])
-        y.append(scaled_data[i, 0])
-        
-    X, y = np.array(X), np.array(y)
-    
-    # Reshape X to be [samples, time steps, features] which is required for LSTM
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-    
-    return X, y, scaler
+def make_window_dataset(series, window_size, batch_size, shuffle=False, shuffle_buffer=None):
+    """
+    Builds a tf.data pipeline that streams windows from a single series buffer.
+
+    Only window start indices flow through the pipeline. Each batch of windows is
+    gathered from the one series tensor, so the (samples, window_size) array is
+    never materialized up front.
+
+    Args:
+        series (np.array): The scaled 1-D series.
+        window_size (int): The size of the sliding window.
+        batch_size (int): The number of samples per batch.
+        shuffle (bool): Whether to reshuffle the samples every epoch. Shuffled
+            datasets also drop the last partial batch so every batch has a static shape.
+        shuffle_buffer (int, optional): The size of the shuffle buffer. Defaults to the
+            number of windows, giving a full shuffle like model.fit() on arrays; the
+            buffer only holds int64 indices, so this is cheap.
+
+    Returns:
+        tf.data.Dataset: A dataset yielding (X, y) batches, with X shaped
+            [batch, time steps, 1].
+    """
+    n_windows = len(series) - window_size
+    series_tensor = tf.constant(series, dtype=tf.float32)
+    offsets = tf.range(window_size, dtype=tf.int64)
+
+    def gather_windows(start):
+        X = tf.gather(series_tensor, start[:, None] + offsets)[..., None]
+        y = tf.gather(series_tensor, start + window_size)
+        return X, y
+
+    # Nothing is cached: the pipeline only holds indices, and caching the gathered
+    # windows would materialize the very (samples, window_size) copy this avoids
+    ds = tf.data.Dataset.range(n_windows)
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer or n_windows)
+    ds = ds.batch(batch_size, drop_remainder=shuffle)
+    ds = ds.map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
 
 def split_data(df, train_end, val_end):
     """
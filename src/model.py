@@ -4,16 +4,92 @@ Module for defining and building LSTM models using a class-based approach.
 """
 import os
 import json
-import contextlib
-import io
+import matplotlib
+matplotlib.use('Agg')  # Headless backend; plots are only ever saved to disk
+import matplotlib.pyplot as plt
+import numpy as np
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras import mixed_precision
+from tensorflow.keras.layers import LSTM, Dense, Dropout, Activation
 from tensorflow.keras.optimizers import Adam
 
+def make_forecast_fn(model, window_size, horizon, batch_size=None, jit_compile=False):
+    """
+    Wraps the model in a tf.function that forecasts `horizon` steps.
+
+    The autoregressive loop (predict, shift the window, append the prediction)
+    runs inside the graph, so a whole rolling forecast costs a single
+    Python -> TensorFlow call instead of one model.predict() per day.
+
+    Args:
+        model: The Keras model predicting the next value from a window.
+        window_size (int): The size of the input window.
+        horizon (int): The number of future steps to predict.
+        batch_size (int, optional): A fixed batch size to specialize the function to.
+        jit_compile (bool): Whether to compile the function with XLA. Follows
+            TRAINING_PARAMS['jit_compile'], so it can be disabled for layers XLA
+            cannot compile (e.g. the CuDNN LSTM kernel on GPU).
+
+    Returns:
+        A function mapping a (batch, window_size, 1) tensor to (batch, horizon).
+    """
+    @tf.function(
+        jit_compile=jit_compile,
+        input_signature=[tf.TensorSpec((batch_size, window_size, 1), tf.float32)]
+    )
+    def forecast(x):
+        predictions = tf.TensorArray(tf.float32, size=horizon)
+        window = x
+        for step in tf.range(horizon):
+            next_value = tf.cast(model(window, training=False), tf.float32)
+            predictions = predictions.write(step, next_value[:, 0])
+            window = tf.concat([window[:, 1:, :], next_value[:, None, :]], axis=1)
+        return tf.transpose(predictions.stack())
+
+    return forecast
+
+def make_tflite_predict_fn(tflite_path, num_threads=None):
+    """
+    Loads an INT8 TFLite model and returns a single-step prediction function.
+
+    The returned function quantizes a float32 window with the model's input
+    parameters, runs the interpreter and de-quantizes the output. The interpreter
+    uses the default CPU op resolver, which applies the XNNPACK delegate where the
+    target hardware supports its int8 kernels.
+
+    Args:
+        tflite_path (str): The path to the INT8 TFLite model.
+        num_threads (int, optional): The number of threads for the interpreter.
+
+    Returns:
+        A function mapping a float32 window of shape (window_size, 1) to the
+        predicted next value as a float.
+    """
+    interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    input_scale, input_zero_point = input_details['quantization']
+    output_scale, output_zero_point = output_details['quantization']
+
+    def predict_next(window):
+        x = np.asarray(window, dtype=np.float32).reshape(input_details['shape'])
+        quantized = np.clip(np.round(x / input_scale + input_zero_point), -128, 127).astype(np.int8)
+        interpreter.set_tensor(input_details['index'], quantized)
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index']).astype(np.float32)
+        return float((output.reshape(-1)[0] - output_zero_point) * output_scale)
+
+    return predict_next
+
 class LSTMBuilder:
     """
     Builds, trains, and saves LSTM models based on a flexible configuration.
     """
+    # Shared (figure, axes) reused for every training history plot
+    _history_plot = None
+
     def __init__(self, model_config, training_config):
         """
         Args:
@@ -34,41 +110,84 @@ class LSTMBuilder:
         Returns:
             A compiled Keras model.
         """
+        # Layers created below pick up the global dtype policy
+        precision = self.training_config.get('precision', 'float32')
+        mixed_precision.set_global_policy(precision)
+
         model = Sequential()
         
         # Add input layer definition
-        model.add(LSTM(
-            units=self.model_config['layers'][0]['units'],
-            return_sequences=self.model_config['layers'][0].get('return_sequences', False),
-            input_shape=input_shape
-        ))
+        model.add(self._make_lstm(self.model_config['layers'][0], input_shape=input_shape))
+
+        # A Dropout directly before an LSTM can be folded into that LSTM's input
+        # dropout, which the CuDNN kernel supports, so no separate layer is needed.
+        # This is not equivalent: LSTM input dropout reuses one mask across all
+        # timesteps, while a standalone Dropout samples a fresh mask per timestep,
+        # so the regularization changes when folding is enabled.
+        fuse_dropout = self.model_config.get('fuse_dropout_into_lstm', False)
+        layers = self.model_config['layers']
 
         # Add subsequent layers
-        for layer_config in self.model_config['layers'][1:]:
+        pending_dropout = 0.0
+        for i, layer_config in enumerate(layers[1:], start=1):
             layer_type = layer_config['type'].lower()
+            next_type = layers[i + 1]['type'].lower() if i + 1 < len(layers) else None
             
             if layer_type == 'lstm':
-                model.add(LSTM(
-                    units=layer_config['units'],
-                    return_sequences=layer_config.get('return_sequences', False)
-                ))
+                model.add(self._make_lstm(layer_config, dropout=pending_dropout))
+                pending_dropout = 0.0
             elif layer_type == 'dense':
                 model.add(Dense(
                     units=layer_config['units'],
                     activation=layer_config.get('activation', None)
                 ))
             elif layer_type == 'dropout':
-                model.add(Dropout(rate=layer_config['rate']))
+                if fuse_dropout and next_type == 'lstm':
+                    pending_dropout = layer_config['rate']
+                else:
+                    model.add(Dropout(rate=layer_config['rate']))
             else:
                 raise ValueError(f"Unsupported layer type: {layer_type}")
 
+        if precision != 'float32':
+            # Keep the model output in float32 for numerically stable losses
+            model.add(Activation('linear', dtype='float32'))
+
         optimizer = Adam(learning_rate=self.training_config['learning_rate'])
-        model.compile(optimizer=optimizer, loss=self.training_config['loss_function'])
+        if precision == 'mixed_float16':
+            # float16 gradients can underflow without dynamic loss scaling
+            optimizer = mixed_precision.LossScaleOptimizer(optimizer)
+        model.compile(
+            optimizer=optimizer,
+            loss=self.training_config['loss_function'],
+            jit_compile=self.training_config.get('jit_compile', False)
+        )
         
         self.model = model
         return self.model
 
-    def save(self, save_path, history, full_config):
+    def _make_lstm(self, layer_config, **kwargs):
+        """
+        Creates an LSTM layer pinned to the arguments required by the CuDNN kernel.
+
+        Keras only dispatches to the fused CuDNN implementation on GPU when these
+        arguments keep their defaults, so they are passed explicitly to guard
+        against accidental changes. Input `dropout` is compatible with CuDNN and
+        standalone Dropout layers between LSTMs do not affect the kernel either,
+        since it is selected per layer.
+        """
+        return LSTM(
+            units=layer_config['units'],
+            return_sequences=layer_config.get('return_sequences', False),
+            activation='tanh',
+            recurrent_activation='sigmoid',
+            recurrent_dropout=0.0,
+            unroll=False,
+            use_bias=True,
+            **kwargs
+        )
+
+    def save(self, save_path, history, full_config, scaler=None, dates=None):
         """
         Saves the model, a plot of its training history, and a model card.
 
@@ -76,6 +195,10 @@ class LSTMBuilder:
             save_path (str): The directory to save the model and artifacts.
             history (History): The Keras History object from model.fit().
             full_config (dict): The complete configuration used for the run.
+            scaler (FastMinMax, optional): The fitted scaler to save alongside the
+                model so predictions do not need to refit it.
+            dates (np.array, optional): The sorted trading dates of the data as datetime64[D],
+                used at prediction time to look up forecast dates without reloading the data.
         """
         if self.model is None:
             raise ValueError("Model has not been built yet. Call .build() first.")
@@ -84,10 +207,24 @@ class LSTMBuilder:
         os.makedirs(save_path, exist_ok=True)
         
         # 2. Save the Keras model file
-        model_file_path = os.path.join(save_path, 'model.h5')
+        model_file_path = os.path.join(save_path, 'model.keras')
         self.model.save(model_file_path)
         print(f"Model file saved to {model_file_path}")
 
+        if scaler is not None:
+            scaler_path = os.path.join(save_path, 'scaler.npz')
+            scaler.save(scaler_path)
+            print(f"Scaler saved to {scaler_path}")
+
+        if dates is not None:
+            dates_path = os.path.join(save_path, 'dates.npy')
+            np.save(dates_path, dates)
+            print(f"Trading dates saved to {dates_path}")
+
+        savedmodel_path = os.path.join(save_path, 'savedmodel')
+        self._export_savedmodel(savedmodel_path, full_config['WINDOW_SIZE'], full_config['PREDICTION_DAYS'])
+        print(f"SavedModel exported to {savedmodel_path}")
+
         # 3. Save the training history plot
         plot_path = os.path.join(save_path, 'training_loss.png')
         self._plot_training_history(history, plot_path)
@@ -98,29 +235,112 @@ class LSTMBuilder:
         self._generate_model_card(card_path, history, full_config)
         print(f"Model card saved to {card_path}")
 
+    def export_tflite_int8(self, save_path, representative_X, validation_X, num_samples=100):
+        """
+        Exports a fully INT8-quantized TFLite model for fast CPU inference.
+
+        Args:
+            save_path (str): The directory to save the TFLite model in.
+            representative_X (np.array): Sample inputs with shape (n_samples, window_size, n_features)
+                used to calibrate the quantization ranges.
+            num_samples (int): The number of representative samples to use for calibration.
+                They are spread evenly over `representative_X` so the quantization ranges
+                cover the whole price history rather than only its start.
+            validation_X (np.array): Held-out inputs, with the same shape as `representative_X`,
+                on which the INT8 model is compared against the float model. Unlike the
+                calibration windows, these can fall outside the calibrated input range.
+
+        Returns:
+            str: The path to the saved TFLite model.
+        """
+        if self.model is None:
+            raise ValueError("Model has not been built yet. Call .build() first.")
+
+        precision = self.training_config.get('precision', 'float32')
+        if precision != 'float32':
+            raise ValueError(f"INT8 TFLite export requires a float32 model, but precision is '{precision}'.")
+
+        sample_idx = np.linspace(0, len(representative_X) - 1, num=min(num_samples, len(representative_X)))
+        calibration_X = representative_X[sample_idx.astype(int)]
+
+        # LSTM conversion needs a static input shape, so trace with a batch size of 1
+        input_spec = tf.TensorSpec((1,) + tuple(representative_X.shape[1:]), tf.float32)
+        concrete_fn = tf.function(lambda x: self.model(x, training=False)).get_concrete_function(input_spec)
+
+        def representative_dataset():
+            for x in calibration_X:
+                yield [x[None, ...].astype(np.float32)]
+
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_fn], self.model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+        os.makedirs(save_path, exist_ok=True)
+        tflite_path = os.path.join(save_path, 'model_int8.tflite')
+        with open(tflite_path, 'wb') as f:
+            f.write(converter.convert())
+        print(f"INT8 TFLite model saved to {tflite_path}")
+
+        error = self._tflite_mean_abs_error(tflite_path, validation_X)
+        print(f"INT8 TFLite mean absolute error vs. the float model on validation data (scaled units): {error:.6f}")
+        return tflite_path
+
+    def _tflite_mean_abs_error(self, tflite_path, samples):
+        """Compares the INT8 TFLite model against the Keras model on the given samples."""
+        predict_next = make_tflite_predict_fn(tflite_path)
+        samples = np.asarray(samples, dtype=np.float32)
+
+        float_values = self.model(samples, training=False).numpy().reshape(-1)
+        tflite_values = np.array([predict_next(x) for x in samples], dtype=np.float32)
+        return float(np.mean(np.abs(tflite_values - float_values)))
+
+    def _export_savedmodel(self, savedmodel_path, window_size, horizon):
+        """
+        Exports the model as a SavedModel with a 'forecast' signature for a batch size of 1.
+
+        The signature runs the rolling `horizon`-step forecast, so prediction can load
+        it without rebuilding the Keras model or retracing. It is XLA-compiled only if
+        TRAINING_PARAMS['jit_compile'] was set for training.
+        """
+        forecast = make_forecast_fn(
+            self.model, window_size, horizon, batch_size=1,
+            jit_compile=self.training_config.get('jit_compile', False)
+        )
+        tf.saved_model.save(
+            self.model,
+            savedmodel_path,
+            signatures={'forecast': forecast.get_concrete_function()}
+        )
+
     def _plot_training_history(self, history, plot_path):
         """Generates and saves a plot of the training and validation loss."""
-        import matplotlib.pyplot as plt
-        plt.figure(figsize=(10, 6))
-        plt.plot(history.history['loss'], label='Training Loss')
-        plt.plot(history.history['val_loss'], label='Validation Loss')
-        plt.title('Model Loss Over Epochs')
-        plt.ylabel('Loss')
-        plt.xlabel('Epoch')
-        plt.legend()
-        plt.savefig(plot_path)
-        plt.close()
+        if LSTMBuilder._history_plot is None:
+            LSTMBuilder._history_plot = plt.subplots(figsize=(10, 6))
+        fig, ax = LSTMBuilder._history_plot
+        ax.clear()
+        ax.plot(history.history['loss'], label='Training Loss')
+        ax.plot(history.history['val_loss'], label='Validation Loss')
+        ax.set_title('Model Loss Over Epochs')
+        ax.set_ylabel('Loss')
+        ax.set_xlabel('Epoch')
+        ax.legend()
+        fig.savefig(plot_path, dpi=80)
 
     def _generate_model_card(self, card_path, history, full_config):
         """Creates a markdown file with details about the model and training run."""
         final_loss = history.history['loss'][-1]
         final_val_loss = history.history['val_loss'][-1]
         
-        # Capture model summary
-        summary_stream = io.StringIO()
-        with contextlib.redirect_stdout(summary_stream):
-            self.model.summary()
-        summary_string = summary_stream.getvalue()
+        # Build a concise layer summary instead of capturing model.summary() output
+        summary_lines = [
+            f"{layer.name}: {layer.__class__.__name__} params={layer.count_params()} out={tuple(layer.output.shape)}"
+            for layer in self.model.layers
+        ]
+        summary_lines.append(f"Total params: {self.model.count_params()}")
+        summary_string = '\n'.join(summary_lines)
 
         card_content = f"""
 # Model Card: {self.model_config['name']}
@@ -152,7 +372,7 @@ from tensorflow.keras.models import load_model
 import numpy as np
 
 # Load the model
-model = load_model('{os.path.join(os.path.basename(card_path).replace("model_card.md", ""), "model.h5")}')
+model = load_model('{os.path.join(os.path.basename(card_path).replace("model_card.md", ""), "model.keras")}')
 
 # Prepare your input data (X_test) with shape (n_samples, window_size, n_features)
 # For this model, window_size={full_config['WINDOW_SIZE']} and n_features=1
@@ -4,10 +4,12 @@ Main script for training the LSTM model.
 """
 import os
 import json
-import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Headless backend; plots are only ever saved to disk
 import matplotlib.pyplot as plt
 from src import config
-from src.data_loader import load_data, preprocess_data, split_data
+from src.data_loader import (load_data, split_data, FastMinMax, to_series,
+                             window_view, make_window_dataset)
 from src.model import LSTMBuilder
 
 def plot_training_history(history, model_path):
@@ -34,7 +36,8 @@ def get_full_config():
         'VAL_END_DATE': config.VAL_END_DATE,
         'WINDOW_SIZE': config.WINDOW_SIZE,
         'MODEL_ARCHITECTURE': config.MODEL_ARCHITECTURE,
-        'TRAINING_PARAMS': config.TRAINING_PARAMS
+        'TRAINING_PARAMS': config.TRAINING_PARAMS,
+        'PREDICTION_DAYS': config.PREDICTION_DAYS
     }
 
 def train():
@@ -51,41 +54,45 @@ def train():
     
     # --- 3. Preprocess Data ---
     print("Preprocessing data...")
-    X_train, y_train, scaler = preprocess_data(train_df, config.WINDOW_SIZE)
-    
-    scaled_val_data = scaler.transform(val_df)
-    X_val, y_val = [], []
-    for i in range(config.WINDOW_SIZE, len(scaled_val_data)):
-        X_val.append(scaled_val_data[i-config.WINDOW_SIZE:i, 0])
-        y_val.append(scaled_val_data[i, 0])
-    X_val, y_val = np.array(X_val), np.array(y_val)
-    X_val = np.reshape(X_val, (X_val.shape[0], X_val.shape[1], 1))
+    # Each split is kept as one contiguous series; windows are only views into it
+    scaler = FastMinMax()
+    train_series = to_series(scaler.fit_transform(train_df))
+    val_series = to_series(scaler.transform(val_df))
 
-    if X_train.shape[0] == 0 or X_val.shape[0] == 0:
+    batch_size = config.TRAINING_PARAMS['batch_size']
+    # The training dataset drops partial batches, so it needs at least one full batch
+    if len(train_series) - config.WINDOW_SIZE < batch_size or len(val_series) <= config.WINDOW_SIZE:
         raise ValueError("Training or validation set is empty. Check date ranges and data.")
 
     # --- 4. Build Model ---
     print("Building model...")
     builder = LSTMBuilder(config.MODEL_ARCHITECTURE, config.TRAINING_PARAMS)
-    input_shape = (X_train.shape[1], 1)
+    input_shape = (config.WINDOW_SIZE, 1)
     model = builder.build(input_shape)
     model.summary()
 
     # --- 5. Train Model ---
     print("Training model...")
+    train_ds = make_window_dataset(train_series, config.WINDOW_SIZE, batch_size, shuffle=True)
+    val_ds = make_window_dataset(val_series, config.WINDOW_SIZE, batch_size)
     history = model.fit(
-        X_train,
-        y_train,
-        batch_size=config.TRAINING_PARAMS['batch_size'],
+        train_ds,
         epochs=config.TRAINING_PARAMS['epochs'],
-        validation_data=(X_val, y_val)
+        validation_data=val_ds
     )
 
     # --- 6. Save Model and Model Card ---
     print("Saving model and generating model card...")
     save_path = config.get_model_save_path()
     full_config = get_full_config()
-    builder.save(save_path, history, full_config)
+    builder.save(save_path, history, full_config, scaler=scaler,
+                 dates=df.index.values.astype('datetime64[D]'))
+    if config.EXPORT_TFLITE_INT8 and config.TRAINING_PARAMS.get('precision', 'float32') != 'float32':
+        print("Skipping INT8 TFLite export: it requires TRAINING_PARAMS['precision'] = 'float32'.")
+    elif config.EXPORT_TFLITE_INT8:
+        builder.export_tflite_int8(save_path,
+                                   window_view(train_series, config.WINDOW_SIZE),
+                                   window_view(val_series, config.WINDOW_SIZE))
     print(f"All artifacts saved in: {save_path}")
 
 if __name__ == '__main__':